@@ -0,0 +1,125 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+
+# Модули подключаются внутри подкоманд: каждая команда платит только за то, что использует
+
+
+def run_crawl(args):
+    import python_script_parser
+    from config import CRAWL_INTERVAL
+
+    interval = args.interval or CRAWL_INTERVAL
+    while True:
+        started = time.monotonic()
+        try:
+            python_script_parser.main()
+        except Exception:
+            print(traceback.format_exc())
+        if args.once:
+            return
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+
+def run_clean(args):
+    import python_script_parser
+
+    python_script_parser.clean_old_reels()
+
+
+def run_ai_worker(args):
+    import python_script_AI
+
+    if args.once:
+        python_script_AI.process_pending_videos()
+    else:
+        python_script_AI.process_videos()
+
+
+# Замер холодного старта: каждый импорт в отдельном процессе
+def run_bench(args):
+    targets = [
+        ("cli", "import cli"),
+        ("crawl", "import python_script_parser"),
+        ("ai-worker", "import python_script_AI"),
+        ("aiogram", "import aiogram"),
+        ("openai", "import openai"),
+    ]
+    code = "import time; t = time.perf_counter(); {}; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    for name, statement in targets:
+        timings = []
+        for _ in range(args.repeat):
+            result = subprocess.run([sys.executable, "-c", code.format(statement)], cwd=here,
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{name:<10} ошибка: {result.stderr.strip().splitlines()[-1]}")
+                break
+            timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+        else:
+            print(f"{name:<10} {statistics.median(timings):8.1f} мс (медиана из {args.repeat})")
+
+
+# Нагрузочный прогон AI-конвейера против локальных фейков Notion, RapidAPI и OpenAI
+def run_load_bench(args):
+    import loadtest
+
+    loadtest.run(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="instazavod", description="Сбор Reels и AI-обработка сценариев")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl = subparsers.add_parser("crawl", help="обход доноров и обновление Reels в Notion")
+    crawl.add_argument("--once", action="store_true", help="один обход без повторов")
+    crawl.add_argument("--interval", type=int, help="пауза между обходами, секунд (по умолчанию CRAWL_INTERVAL)")
+    crawl.set_defaults(handler=run_crawl)
+
+    clean = subparsers.add_parser("clean", help="удаление старых необработанных Reels")
+    clean.set_defaults(handler=run_clean)
+
+    ai_worker = subparsers.add_parser("ai-worker", help="транскрибация и уникализация одобренных видео")
+    ai_worker.add_argument("--once", action="store_true", help="один проход по очереди")
+    ai_worker.set_defaults(handler=run_ai_worker)
+
+    bench = subparsers.add_parser("bench", help="замеры: холодный старт (по умолчанию) или нагрузка на AI")
+    bench.set_defaults(handler=run_bench, repeat=5)
+    bench_kinds = bench.add_subparsers(dest="bench")
+
+    startup = bench_kinds.add_parser("startup", help="время холодного старта команд")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(handler=run_bench)
+
+    load = bench_kinds.add_parser("load", help="прогон синтетических видео через AI-конвейер")
+    load.add_argument("--videos", type=int, default=100)
+    load.add_argument("--rate", type=float, default=0, help="видео в секунду, 0 — все сразу")
+    load.add_argument("--batch-size", type=int, default=1, help="AI_BATCH_SIZE")
+    load.add_argument("--ffmpeg-workers", type=int, default=0, help="FFMPEG_WORKERS")
+    load.add_argument("--clip-seconds", type=float, default=5)
+    load.add_argument("--download-latency", type=float, default=0.3)
+    load.add_argument("--notion-latency", type=float, default=0.2)
+    load.add_argument("--transcribe-latency", type=float, default=2.0)
+    load.add_argument("--chat-latency", type=float, default=0.8)
+    load.add_argument("--run-latency", type=float, default=3.0, help="время выполнения run ассистента")
+    load.add_argument("--foreign", type=float, default=0.5, help="доля роликов не на русском")
+    load.add_argument("--duplicates", type=float, default=0.0, help="доля повторяющихся транскрибаций")
+    load.add_argument("--timeout", type=float, default=1800)
+    load.add_argument("--seed", type=int, default=1)
+    load.set_defaults(handler=run_load_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import os
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# Конфигурация API ключей и баз данных Notion
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+NOTION_TOKEN = os.getenv("NOTION_TOKEN")
+NOTION_REELS_DB_ID = os.getenv("NOTION_REELS_DB_ID")
+NOTION_DONORS_DB_ID = os.getenv("NOTION_DONORS_DB_ID")
+RAPIDAPI_KEY = os.getenv("RAPID_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+TRANSCRIP_ASSISTANT = os.getenv("TRANSCRIP_ASSISTANT")
+HEADERS_ASSISTANT = os.getenv("HEADERS_ASSISTANT")
+
+# Адреса API (переопределяются для нагрузочного теста)
+NOTION_API_URL = os.getenv("NOTION_API_URL", "https://api.notion.com/v1")
+RAPIDAPI_DOWNLOAD_URL = os.getenv("RAPIDAPI_DOWNLOAD_URL",
+                                  "https://social-download-all-in-one.p.rapidapi.com/v1/social/autolink")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Настройки AI-обработчика
+TRANSCRIBE_BACKEND = os.getenv("TRANSCRIBE_BACKEND", "openai")  # openai (whisper-1) или local (faster-whisper на CPU)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")  # Модель для локального движка
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", 0))  # 0 — по умолчанию faster-whisper
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", 8))
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", 1))  # Сколько видео транскрибировать одной пачкой
+FFMPEG_WORKERS = int(os.getenv("FFMPEG_WORKERS", 0))  # 0 — по числу ядер
+FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", 300))
+NOTION_FLUSH_PAGES = int(os.getenv("NOTION_FLUSH_PAGES", 5))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "dedup_index.json")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", "scheduler_state.json")  # Время одобрения видео
+# Веса для расчета приоритета очереди
+PRIORITY_W_VIEWS = float(os.getenv("PRIORITY_W_VIEWS", 1.0))  # за каждый порядок просмотров
+PRIORITY_W_ER = float(os.getenv("PRIORITY_W_ER", 0.5))  # за каждый процент ER
+PRIORITY_W_KF = float(os.getenv("PRIORITY_W_KF", 2.0))  # за отношение к среднему числу просмотров донора
+PRIORITY_W_AGE = float(os.getenv("PRIORITY_W_AGE", 0.1))  # за каждый час ожидания после одобрения
+PRIORITY_DEADLINE_WINDOW = float(os.getenv("PRIORITY_DEADLINE_WINDOW_MIN", 30)) * 60  # секунд до дедлайна
+AI_POLL_INTERVAL = 60  # Пауза между опросами Notion, секунд
+
+# Настройки парсера
+CRAWL_INTERVAL = int(os.getenv("CRAWL_INTERVAL", 24 * 60 * 60))  # Пауза между обходами доноров, секунд
+
+# Кому отправлять уведомления об ошибках
+ADMIN_CHAT_IDS = [414054050, 663679771]
+
+# Заголовки для запросов
+notion_headers = {
+    "Authorization": f"Bearer {NOTION_TOKEN}",
+    "Notion-Version": "2022-06-28",
+    "Content-Type": "application/json"
+}
+rapidapi_headers = {
+    "x-rapidapi-host": "social-download-all-in-one.p.rapidapi.com",
+    "x-rapidapi-key": RAPIDAPI_KEY,
+    "Content-Type": "application/json"
+}
+openai_headers = {
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+
+# Тяжелые клиенты создаются при первом обращении, а не при импорте
+@functools.lru_cache(maxsize=None)
+def get_bot():
+    from aiogram import Bot
+    return Bot(token=TELEGRAM_BOT_TOKEN)
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+
+def notify_admins(text):
+    for chat_id in ADMIN_CHAT_IDS:
+        asyncio.run(get_bot().send_message(chat_id, text))
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import random
+import re
+
+NUM_PERM = 128  # Длина MinHash-подписи
+BANDS = 32  # LSH: подпись делится на BANDS полос по NUM_PERM // BANDS значений
+SHINGLE_SIZE = 3  # Шинглы из трех слов подряд
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Параметры хеш-функций фиксированы, чтобы подписи совпадали между запусками
+_rng = random.Random(20240501)
+_PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles(text)]
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    return sum(1 for x, y in zip(signature, other) if x == y) / NUM_PERM
+
+
+class DedupIndex:
+    """Индекс похожих транскрибаций (MinHash + LSH) с хранением на диске.
+
+    Для каждой обработанной транскрибации запоминаются подпись и результат
+    ассистентов. Кандидаты на повтор ищутся по совпавшим полосам LSH,
+    а затем проверяются по оценке сходства Жаккара против threshold.
+    """
+
+    def __init__(self, path, threshold=0.8):
+        self.path = path
+        self.threshold = threshold
+        self.entries = {}  # page_id -> {"signature", "unique_text", "headers_text"}
+        self.buckets = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+            for page_id, entry in self.entries.items():
+                self._index(page_id, entry["signature"])
+
+    def _bands(self, signature):
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            yield band, tuple(signature[band * rows:(band + 1) * rows])
+
+    def _index(self, page_id, signature):
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, set()).add(page_id)
+
+    # Поиск ранее обработанного ролика с похожей транскрибацией (кроме самой страницы exclude)
+    def find(self, text, exclude=None):
+        signature = minhash(text)
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(exclude)
+
+        best, best_score = None, self.threshold
+        for page_id in candidates:
+            score = similarity(signature, self.entries[page_id]["signature"])
+            if score >= best_score:
+                best, best_score = page_id, score
+        if best is None:
+            return None
+        entry = self.entries[best]
+        return {"page_id": best, "similarity": best_score,
+                "unique_text": entry["unique_text"], "headers_text": entry["headers_text"]}
+
+    def add(self, page_id, text, unique_text, headers_text):
+        signature = minhash(text)
+        self.entries[page_id] = {"signature": signature, "unique_text": unique_text, "headers_text": headers_text}
+        self._index(page_id, signature)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,7 +1,5 @@
 #!/bin/sh
 
-echo "Установка зависимостей..."
-pip install -r requirements.txt
-
+# Зависимости ставятся при сборке образа (см. Dockerfile)
 echo "Запуск приложения..."
-python python_script_AI.py
+exec python cli.py "${@:-ai-worker}"
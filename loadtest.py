@@ -0,0 +1,363 @@
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ffmpeg
+
+DONORS = {f"donor_{i}": 10000 * (i + 1) for i in range(10)}  # username -> среднее число просмотров
+WORDS = ("сегодня покажу простой способ как быстро приготовить ужин из того что есть "
+         "в холодильнике без лишних затрат и сложных рецептов попробуй сам и напиши "
+         "в комментариях что получилось а я расскажу еще пару секретов").split()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+# Короткий синтетический ролик: тон 440 Гц на черном фоне
+def make_media(workdir, seconds):
+    path = os.path.join(workdir, "clip.mp4")
+    audio = ffmpeg.input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+    video = ffmpeg.input(f"color=c=black:s=320x240:d={seconds}", f="lavfi")
+    (
+        ffmpeg.output(video, audio, path, vcodec="libx264", acodec="aac", preset="ultrafast", shortest=None)
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return path
+
+
+class FakeState:
+    """Состояние фейковых Notion, RapidAPI и OpenAI для нагрузочного теста."""
+
+    def __init__(self, args, media_path):
+        self.args = args
+        self.lock = threading.Lock()
+        self.random = random.Random(args.seed)
+        with open(media_path, "rb") as f:
+            self.media = f.read()
+        self.duplicate_text = " ".join(self.random.choice(WORDS) for _ in range(60))
+        self.pages = {}  # page_id -> страница в формате Notion
+        self.injected_at = {}
+        self.final = set()  # страницы, получившие этап СЦЕНАРИЙ
+        self.done_at = {}
+        self.threads = {}  # thread_id -> сообщения
+        self.runs = {}  # run_id -> (thread_id, время старта, входной текст)
+
+    def latency(self, base):
+        with self.lock:
+            factor = self.random.uniform(0.5, 1.5)
+        time.sleep(base * factor)
+
+    def add_page(self):
+        page_id = str(uuid.uuid4())
+        with self.lock:
+            self.pages[page_id] = {
+                "object": "page",
+                "id": page_id,
+                "last_edited_time": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+                "properties": {
+                    "Одобрено": {"checkbox": True},
+                    "Статус": {"status": {"name": "N/A"}},
+                    "Этап": {"select": None},
+                    "Референс": {"url": f"https://www.instagram.com/reel/{page_id[:8]}"},
+                    "Просмотры": {"number": self.random.randint(1000, 2000000)},
+                    "ER": {"number": round(self.random.uniform(0, 5), 2)},
+                    "Автор": {"rich_text": [{"plain_text": self.random.choice(list(DONORS))}]},
+                },
+            }
+            self.injected_at[page_id] = time.monotonic()
+
+    def pending_pages(self):
+        with self.lock:
+            return [page for page in self.pages.values() if page["properties"]["Этап"]["select"] is None]
+
+    def transcript(self):
+        with self.lock:
+            if self.random.random() < self.args.duplicates:
+                return self.duplicate_text
+            return " ".join(self.random.choice(WORDS) for _ in range(60))
+
+    def queue_depth(self):
+        with self.lock:
+            return len(self.injected_at) - len(self.done_at)
+
+
+def message(thread_id, role, text):
+    return {
+        "id": f"msg_{uuid.uuid4().hex}",
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "role": role,
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        "assistant_id": None,
+        "run_id": None,
+        "attachments": [],
+        "metadata": {},
+        "status": "completed",
+    }
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Один HTTP-сервер за все внешние API: маршрут выбирается по префиксу пути."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, payload, content_type="application/json", status=200):
+        if content_type == "application/json":
+            payload = json.dumps(payload).encode()
+        elif isinstance(payload, str):
+            payload = payload.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path.startswith("/media/"):
+            state.latency(state.args.download_latency)
+            return self._send(state.media, "video/mp4")
+
+        match = re.fullmatch(r"/openai/v1/threads/([^/]+)/runs/([^/?]+)", self.path)
+        if match:
+            thread_id, run_id = match.groups()
+            with state.lock:
+                _, started, text = state.runs[run_id]
+                finished = time.monotonic() - started >= state.args.run_latency
+                if finished and state.runs[run_id][2] is not None:
+                    state.threads[thread_id].append(message(thread_id, "assistant", f"Сценарий: {text}"))
+                    state.runs[run_id] = (thread_id, started, None)
+            return self._send({"id": run_id, "object": "thread.run", "thread_id": thread_id,
+                               "status": "completed" if finished else "in_progress"})
+
+        match = re.fullmatch(r"/openai/v1/threads/([^/]+)/messages(\?.*)?", self.path)
+        if match:
+            with state.lock:
+                data = list(state.threads[match.group(1)])
+            return self._send({"object": "list", "data": data, "has_more": False,
+                               "first_id": data[0]["id"] if data else None,
+                               "last_id": data[-1]["id"] if data else None})
+
+        self._send({"error": self.path}, status=404)
+
+    def do_POST(self):
+        state = self.server.state
+        body = self._body()
+
+        if self.path == "/notion/v1/databases/load-donors/query":
+            state.latency(state.args.notion_latency)
+            donors = [{"id": username, "properties": {
+                "username": {"title": [{"text": {"content": username}}]},
+                "Среднее число просмотров": {"number": average_views},
+            }} for username, average_views in DONORS.items()]
+            return self._send({"object": "list", "results": donors, "has_more": False, "next_cursor": None})
+
+        if re.fullmatch(r"/notion/v1/databases/[^/]+/query", self.path):
+            state.latency(state.args.notion_latency)
+            return self._send({"object": "list", "results": state.pending_pages(),
+                               "has_more": False, "next_cursor": None})
+
+        if self.path == "/rapid/autolink":
+            state.latency(state.args.download_latency)
+            host, port = self.server.server_address
+            return self._send({"error": False, "medias": [{"url": f"http://{host}:{port}/media/clip.mp4"}]})
+
+        if self.path == "/openai/v1/audio/transcriptions":
+            state.latency(state.args.transcribe_latency)
+            return self._send(state.transcript(), "text/plain")
+
+        if self.path == "/openai/v1/chat/completions":
+            state.latency(state.args.chat_latency)
+            content = json.loads(body)["messages"][0]["content"]
+            if content.startswith("Определи язык"):
+                with state.lock:
+                    answer = "en" if state.random.random() < state.args.foreign else "ru"
+            else:
+                answer = content.rsplit("\n", 1)[-1].strip()
+            return self._send({"object": "chat.completion",
+                               "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}]})
+
+        if self.path == "/openai/v1/threads":
+            thread_id = f"thread_{uuid.uuid4().hex}"
+            with state.lock:
+                state.threads[thread_id] = []
+            return self._send({"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+
+        match = re.fullmatch(r"/openai/v1/threads/([^/]+)/messages", self.path)
+        if match:
+            thread_id = match.group(1)
+            item = message(thread_id, "user", json.loads(body)["content"])
+            with state.lock:
+                state.threads[thread_id].append(item)
+            return self._send(item)
+
+        match = re.fullmatch(r"/openai/v1/threads/([^/]+)/runs", self.path)
+        if match:
+            thread_id = match.group(1)
+            run_id = f"run_{uuid.uuid4().hex}"
+            with state.lock:
+                text = state.threads[thread_id][-1]["content"][0]["text"]["value"]
+                state.runs[run_id] = (thread_id, time.monotonic(), text)
+            return self._send({"id": run_id, "object": "thread.run", "thread_id": thread_id, "status": "queued"})
+
+        self._send({"error": self.path}, status=404)
+
+    def do_PATCH(self):
+        state = self.server.state
+        data = json.loads(self._body() or b"{}")
+        state.latency(state.args.notion_latency)
+
+        match = re.fullmatch(r"/notion/v1/pages/([^/]+)", self.path)
+        if match:
+            page_id = match.group(1)
+            stage = data.get("properties", {}).get("Этап")
+            with state.lock:
+                if stage:
+                    state.pages[page_id]["properties"]["Этап"] = stage
+                    if stage["select"]["name"] == "СЦЕНАРИЙ":
+                        state.final.add(page_id)
+            return self._send(state.pages[page_id])
+
+        match = re.fullmatch(r"/notion/v1/blocks/([^/]+)/children", self.path)
+        if match:
+            page_id = match.group(1)
+            with state.lock:
+                if page_id in state.final:
+                    state.done_at.setdefault(page_id, time.monotonic())
+            return self._send({"object": "list", "results": []})
+
+        self._send({"error": self.path}, status=404)
+
+
+# Замер времени этапов через обертки над функциями конвейера
+def instrument(ai, records):
+    def wrap(name, func):
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                records.append((name, started, time.monotonic()))
+        return wrapper
+
+    for name in ("download_video", "transcribe_batch", "transcribe_audio", "detect_language",
+                 "translate_text_with_openai", "get_unique_text_from_assistant", "get_headers_from_assistant"):
+        setattr(ai, name, wrap(name, getattr(ai, name)))
+    ai.media_pool._convert = wrap("ffmpeg", ai.media_pool._convert)
+    ai.notion_writer.flush_page = wrap("notion_write", ai.notion_writer.flush_page)
+
+
+def report(state, records, depth_samples, started, finished):
+    print(f"\nВидео: {len(state.injected_at)}, обработано: {len(state.done_at)}, "
+          f"время прогона: {finished - started:.1f} с")
+
+    print("\nЭтап                              вызовов   в сек   p50, с   p95, с")
+    for name in dict.fromkeys(record[0] for record in records):
+        stage = [record for record in records if record[0] == name]
+        durations = [end - start for _, start, end in stage]
+        span = max(end for _, _, end in stage) - min(start for _, start, _ in stage)
+        rate = len(stage) / span if span > 0 else 0
+        print(f"{name:<32} {len(stage):>7} {rate:>7.2f} {percentile(durations, 50):>8.2f} "
+              f"{percentile(durations, 95):>8.2f}")
+
+    latencies = [state.done_at[page_id] - state.injected_at[page_id] for page_id in state.done_at]
+    print(f"\nЗадержка от появления в Notion до записи сценария: "
+          f"p50 {percentile(latencies, 50):.1f} с, p95 {percentile(latencies, 95):.1f} с, "
+          f"p99 {percentile(latencies, 99):.1f} с")
+
+    print("\nГлубина очереди (необработанные видео):")
+    step = max(1, len(depth_samples) // 20)
+    for moment, depth in depth_samples[::step]:
+        print(f"{moment:>7.1f} с {depth:>5} {'#' * min(depth, 60)}")
+    print(f"максимум: {max((depth for _, depth in depth_samples), default=0)}")
+
+
+def run(args):
+    if "config" in sys.modules:
+        raise Exception("Нагрузочный тест нужно запускать до импорта config")
+
+    workdir = tempfile.mkdtemp(prefix="instazavod-load-")
+    state = FakeState(args, make_media(workdir, args.clip_seconds))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ.update({
+        "NOTION_API_URL": f"{base_url}/notion/v1",
+        "RAPIDAPI_DOWNLOAD_URL": f"{base_url}/rapid/autolink",
+        "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+        "OPENAI_API_KEY": "load-test",
+        "NOTION_REELS_DB_ID": "load-test",
+        "NOTION_DONORS_DB_ID": "load-donors",
+        "SCHEDULER_STATE_PATH": os.path.join(workdir, "scheduler_state.json"),
+        "TRANSCRIP_ASSISTANT": "asst_unique",
+        "HEADERS_ASSISTANT": "asst_headers",
+        "TRANSCRIBE_BACKEND": "openai",
+        "DEDUP_INDEX_PATH": os.path.join(workdir, "dedup_index.json"),
+        "AI_BATCH_SIZE": str(args.batch_size),
+        "FFMPEG_WORKERS": str(args.ffmpeg_workers),
+    })
+    # Скачанные файлы пишутся в текущий каталог
+    os.chdir(workdir)
+
+    import python_script_AI as ai
+
+    records = []
+    instrument(ai, records)
+
+    started = time.monotonic()
+    stop = threading.Event()
+    depth_samples = []
+
+    def inject():
+        for _ in range(args.videos):
+            state.add_page()
+            if args.rate > 0:
+                time.sleep(1 / args.rate)
+
+    def sample():
+        while not stop.is_set():
+            depth_samples.append((time.monotonic() - started, state.queue_depth()))
+            stop.wait(0.5)
+
+    injector = threading.Thread(target=inject, daemon=True)
+    injector.start()
+    threading.Thread(target=sample, daemon=True).start()
+
+    print(f"Прогон {args.videos} видео, журнал конвейера: {os.path.join(workdir, 'pipeline.log')}")
+    with open(os.path.join(workdir, "pipeline.log"), "w") as log, contextlib.redirect_stdout(log):
+        while time.monotonic() - started < args.timeout:
+            if not injector.is_alive() and len(state.done_at) >= args.videos:
+                break
+            ai.process_pending_videos()
+            if not state.pending_pages():
+                time.sleep(0.2)
+    finished = time.monotonic()
+    stop.set()
+    server.shutdown()
+
+    report(state, records, depth_samples, started, finished)
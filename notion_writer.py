@@ -0,0 +1,178 @@
+import time
+
+import requests
+
+NOTION_API_URL = "https://api.notion.com/v1"
+RICH_TEXT_LIMIT = 2000  # Максимальная длина одного текстового элемента в Notion
+BLOCKS_PER_REQUEST = 100  # Максимум дочерних блоков в одном запросе
+MIN_REQUEST_INTERVAL = 0.35  # Notion допускает в среднем ~3 запроса в секунду
+MAX_RETRIES = 5
+MAX_FLUSH_ATTEMPTS = 5  # После стольких неудачных отправок страница снимается с очереди
+
+
+# Разбиение длинного текста на части, которые Notion примет в одном rich_text
+def split_text(text, limit=RICH_TEXT_LIMIT):
+    text = text or ""
+    chunks = []
+    while len(text) > limit:
+        cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit))
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip()
+    chunks.append(text)
+    return chunks
+
+
+def heading_block(text):
+    return {
+        "object": "block",
+        "type": "heading_3",
+        "heading_3": {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {
+                        "content": text
+                    }
+                }
+            ]
+        }
+    }
+
+
+# Абзацы с текстом: всё, что длиннее 2000 символов, раскладывается на несколько блоков
+def paragraph_blocks(text):
+    return [
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {
+                "rich_text": [
+                    {
+                        "type": "text",
+                        "text": {
+                            "content": chunk
+                        }
+                    }
+                ]
+            }
+        }
+        for chunk in split_text(text)
+    ]
+
+
+def link_paragraph_block(text, url):
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [
+                {
+                    "type": "text",
+                    "text": {
+                        "content": text,
+                        "link": {
+                            "url": url
+                        }
+                    }
+                }
+            ]
+        }
+    }
+
+
+class NotionWriter:
+    """Отложенная запись в Notion.
+
+    Изменения свойств и новые блоки копятся по страницам и отправляются
+    пачкой через одно соединение. Повторные изменения одного свойства
+    схлопываются: в Notion уходит только последнее значение.
+    """
+
+    def __init__(self, headers, max_pending_pages=5, api_url=NOTION_API_URL):
+        self.api_url = api_url
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.max_pending_pages = max_pending_pages
+        self.pending = {}  # page_id -> {"properties": {...}, "blocks": [...]}
+        self.last_request_at = 0.0
+
+    def _page(self, page_id):
+        return self.pending.setdefault(page_id, {"properties": {}, "blocks": [], "attempts": 0})
+
+    def update_properties(self, page_id, properties):
+        self._page(page_id)["properties"].update(properties)
+        self._maybe_flush()
+
+    def append_blocks(self, page_id, blocks):
+        self._page(page_id)["blocks"].extend(blocks)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self.pending) > self.max_pending_pages:
+            self.flush()
+
+    # Запрос с соблюдением лимита Notion и повтором при 429
+    def _request(self, method, url, data):
+        for attempt in range(MAX_RETRIES):
+            wait = self.last_request_at + MIN_REQUEST_INTERVAL - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            response = self.session.request(method, url, json=data)
+            self.last_request_at = time.monotonic()
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == MAX_RETRIES - 1:
+                break
+            time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+        return response
+
+    # Неотправленная часть возвращается в очередь, более новые изменения накладываются поверх
+    def _requeue(self, page_id, properties, blocks, attempts):
+        newer = self.pending.pop(page_id, {"properties": {}, "blocks": [], "attempts": 0})
+        if attempts >= MAX_FLUSH_ATTEMPTS and not newer["properties"] and not newer["blocks"]:
+            print(f"Запись в Notion для страницы {page_id} отброшена после {attempts} попыток")
+            return
+        self.pending[page_id] = {
+            "properties": {**properties, **newer["properties"]},
+            "blocks": blocks + newer["blocks"],
+            "attempts": attempts,
+        }
+
+    def flush_page(self, page_id):
+        page = self.pending.pop(page_id, None)
+        if page is None:
+            return
+
+        properties = page["properties"]
+        blocks = page["blocks"]
+        try:
+            if properties:
+                response = self._request("PATCH", f"{self.api_url}/pages/{page_id}",
+                                         {"properties": properties})
+                if response.status_code == 200:
+                    print("Successfully updated Notion page properties.")
+                else:
+                    raise Exception(f"Error updating Notion page properties: {response.text}")
+                properties = {}
+
+            while blocks:
+                response = self._request("PATCH", f"{self.api_url}/blocks/{page_id}/children",
+                                         {"children": blocks[:BLOCKS_PER_REQUEST]})
+                if response.status_code == 200:
+                    print("Successfully added blocks to Notion page.")
+                else:
+                    raise Exception(f"Error adding blocks to Notion page: {response.text}")
+                blocks = blocks[BLOCKS_PER_REQUEST:]
+        except Exception:
+            self._requeue(page_id, properties, blocks, page["attempts"] + 1)
+            raise
+
+    # Отправка всего накопленного; ошибка одной страницы не мешает остальным
+    def flush(self):
+        for page_id in list(self.pending):
+            try:
+                self.flush_page(page_id)
+            except Exception as e:
+                print(e)
@@ -1,54 +1,52 @@
-import asyncio
+import functools
 import os
 import time
 import traceback
-from datetime import datetime
 
-import dotenv
-import ffmpeg
 import requests
-from aiogram import Bot
-from openai import OpenAI
-
-dotenv.load_dotenv()
-
-bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"))
-
-# Конфигурация API ключей и базы данных Notion
-NOTION_TOKEN = os.getenv("NOTION_TOKEN")
-NOTION_DB_ID = os.getenv("NOTION_REELS_DB_ID")
-RAPIDAPI_KEY = os.getenv("RAPID_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Заголовки для запросов
-notion_headers = {
-    "Authorization": f"Bearer {NOTION_TOKEN}",
-    "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json"
-}
-rapidapi_headers = {
-    "x-rapidapi-host": "social-download-all-in-one.p.rapidapi.com",
-    "x-rapidapi-key": RAPIDAPI_KEY,
-    "Content-Type": "application/json"
-}
-openai_headers = {
-    "Authorization": f"Bearer {OPENAI_API_KEY}",
-    "Content-Type": "application/json"
-}
+
+from config import (AI_BATCH_SIZE, AI_POLL_INTERVAL, DEDUP_INDEX_PATH, DEDUP_THRESHOLD, FFMPEG_TIMEOUT,
+                    FFMPEG_WORKERS, HEADERS_ASSISTANT, NOTION_API_URL, NOTION_DONORS_DB_ID, NOTION_FLUSH_PAGES,
+                    NOTION_REELS_DB_ID, OPENAI_BASE_URL, PRIORITY_DEADLINE_WINDOW, PRIORITY_W_AGE, PRIORITY_W_ER,
+                    PRIORITY_W_KF, PRIORITY_W_VIEWS, RAPIDAPI_DOWNLOAD_URL, SCHEDULER_STATE_PATH,
+                    TRANSCRIBE_BACKEND, TRANSCRIP_ASSISTANT, WHISPER_BATCH_SIZE, WHISPER_CPU_THREADS,
+                    WHISPER_MODEL, get_openai_client, notify_admins, notion_headers, openai_headers,
+                    rapidapi_headers)
+from dedup_index import DedupIndex
+from media_pool import FFmpegPool
+from notion_writer import NotionWriter, heading_block, link_paragraph_block, paragraph_blocks
+from scheduler import VideoScheduler
+from transcription import create_backend
+
+# Пул ffmpeg по числу ядер
+media_pool = FFmpegPool(workers=FFMPEG_WORKERS, timeout=FFMPEG_TIMEOUT)
+
+# Отложенная запись в Notion: изменения копятся и отправляются пачкой
+notion_writer = NotionWriter(notion_headers, max_pending_pages=NOTION_FLUSH_PAGES, api_url=NOTION_API_URL)
+
+# Очередь одобренных видео по приоритету (вирусность и время ожидания)
+video_scheduler = VideoScheduler(SCHEDULER_STATE_PATH, w_views=PRIORITY_W_VIEWS, w_er=PRIORITY_W_ER,
+                                 w_kf=PRIORITY_W_KF, w_age=PRIORITY_W_AGE,
+                                 deadline_window=PRIORITY_DEADLINE_WINDOW)
+
+# Индекс уже обработанных транскрибаций: повторы роликов не гоняются через ассистентов
+dedup_index = DedupIndex(DEDUP_INDEX_PATH, threshold=DEDUP_THRESHOLD)
 
 fatal_errors_count = 0
 
 
+# Движок транскрибации создается один раз; локальная модель загружается при первом вызове
+@functools.lru_cache(maxsize=None)
+def get_transcription_backend():
+    if TRANSCRIBE_BACKEND == "openai":
+        return create_backend(TRANSCRIBE_BACKEND, get_openai_client())
+    return create_backend(TRANSCRIBE_BACKEND, model_name=WHISPER_MODEL, cpu_threads=WHISPER_CPU_THREADS,
+                          batch_size=WHISPER_BATCH_SIZE)
+
+
 # Получение данных из Notion
 def get_videos_from_notion():
-    url = f"https://api.notion.com/v1/databases/{NOTION_DB_ID}/query"
-    notion_headers = {
-        "Authorization": f"Bearer {NOTION_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
+    url = f"{NOTION_API_URL}/databases/{NOTION_REELS_DB_ID}/query"
 
     all_videos = []
     has_more = True
@@ -101,50 +99,73 @@ def get_videos_from_notion():
     return all_videos
 
 
+# Среднее число просмотров доноров для расчета KF в очереди
+def get_donor_average_views():
+    url = f"{NOTION_API_URL}/databases/{NOTION_DONORS_DB_ID}/query"
+    payload = {}
+    averages = {}
+
+    while True:
+        response = requests.post(url, headers=notion_headers, json=payload)
+        data = response.json()
+
+        if response.status_code != 200:
+            raise Exception(f"Ошибка при получении доноров из Notion: {data}")
+
+        for result in data.get('results', []):
+            try:
+                properties = result['properties']
+                username = properties['username']['title'][0]['text']['content']
+                averages[username] = properties['Среднее число просмотров']['number'] or 0
+            except Exception:
+                print(traceback.format_exc())
+
+        if data.get("has_more"):
+            payload = {"start_cursor": data["next_cursor"]}
+        else:
+            break
+
+    return averages
+
+
 # Скачивание видео по ссылке
-def download_video(video_url):
+def download_video(video_url, video_file):
     global fatal_errors_count
-    url = "https://social-download-all-in-one.p.rapidapi.com/v1/social/autolink"
+    url = RAPIDAPI_DOWNLOAD_URL
     body = {"url": video_url}
     response = requests.post(url, headers=rapidapi_headers, json=body)
     video_data = response.json()
     if video_data['error'] is True:
         if ('limit' or 'token' in video_data['message']) or fatal_errors_count >= 20:
-            asyncio.run(bot.send_message(414054050, 'Лимит использования rapid api закончился или произошла критическая ошибка api'))
-            asyncio.run(bot.send_message(663679771, 'Лимит использования rapid api закончился или произошла критическая ошибка api'))
+            notify_admins('Лимит использования rapid api закончился или произошла критическая ошибка api')
             return None
     video_response = requests.get(video_data['medias'][0]['url'])
-    with open("downloaded_video.mp4", 'wb') as f:
+    with open(video_file, 'wb') as f:
         f.write(video_response.content)
     return video_data['medias'][0]['url']
 
 
-# Преобразование видео в аудио
-def convert_video_to_audio(video_file):
-    audio_file = video_file.replace(".mp4", ".mp3")
-    ffmpeg.input(video_file).output(audio_file).run()
-    return audio_file
-
-
-# Транскрибация с Whisper
+# Транскрибация выбранным движком (OpenAI или локальный)
 def transcribe_audio(audio_file):
-    audio_file = open("downloaded_video.mp3", "rb")
-    transcription = client.audio.transcriptions.create(
-        model="whisper-1",
-        file=audio_file,
-        response_format="text"
-    )
-
-    audio_file.close()
+    transcription = get_transcription_backend().transcribe(audio_file)
 
     print(transcription)
 
     return transcription
 
 
+def transcribe_batch(audio_files):
+    transcriptions = get_transcription_backend().transcribe_batch(audio_files)
+
+    for transcription in transcriptions:
+        print(transcription)
+
+    return transcriptions
+
+
 # Определение языка с помощью GPT
 def detect_language(text):
-    url = "https://api.openai.com/v1/chat/completions"
+    url = f"{OPENAI_BASE_URL}/chat/completions"
     data = {
         "model": "gpt-3.5-turbo",
         "messages": [
@@ -161,7 +182,7 @@ def detect_language(text):
 
 # Перевод текста с помощью OpenAI
 def translate_text_with_openai(text):
-    url = "https://api.openai.com/v1/chat/completions"
+    url = f"{OPENAI_BASE_URL}/chat/completions"
     data = {
         "model": "gpt-3.5-turbo",
         "messages": [
@@ -191,178 +212,56 @@ def translate_text_with_openai(text):
 
 # Добавление транскрибации и уникализированного текста в Notion
 def update_notion_properties(page_id, stage, status):
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-
-    current_date = datetime.now().strftime("%Y-%m-%d")
-
-    if status is None:
-        data = {
-            "properties": {
-                "Этап": {
-                    "select": {
-                        "name": stage
-                    }
-                }
+    properties = {
+        "Этап": {
+            "select": {
+                "name": stage
             }
         }
-    else:
-        data = {
-            "properties": {
-                "Этап": {
-                    "select": {
-                        "name": stage
-                    }
-                },
-                "Статус": {
-                    "status": {
-                        "name": status
-                    }
-                }
+    }
+    if status is not None:
+        properties["Статус"] = {
+            "status": {
+                "name": status
             }
         }
 
-    response = requests.patch(url, headers=notion_headers, json=data)
-
-    if response.status_code == 200:
-        print("Successfully updated Notion page properties.")
-    else:
-        raise Exception(f"Error updating Notion page properties: {response.json()}")
+    notion_writer.update_properties(page_id, properties)
 
 
 def add_notion_blocks(page_id, unique_text, headers_text, transcribe):
-    url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-
-    data = {
-        "children": [
-            {
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": "Транскрибация:"
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": transcribe
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": "Новый сценарий:"
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": unique_text
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": "5 заголовков:"
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": headers_text
-                            }
-                        }
-                    ]
-                }
-            }
-        ]
-    }
-
-    response = requests.patch(url, headers=notion_headers, json=data)
-
-    if response.status_code == 200:
-        print("Successfully added blocks to Notion page.")
-        print(transcribe+'\n')
-        print(unique_text+'\n')
-        print(headers_text+'\n')
+    notion_writer.append_blocks(page_id, [
+        heading_block("Транскрибация:"),
+        *paragraph_blocks(transcribe),
+        heading_block("Новый сценарий:"),
+        *paragraph_blocks(unique_text),
+        heading_block("5 заголовков:"),
+        *paragraph_blocks(headers_text),
+    ])
 
-
-    else:
-        raise Exception(f"Error adding blocks to Notion page: {response.json()}")
+    print(transcribe+'\n')
+    print(unique_text+'\n')
+    print(headers_text+'\n')
 
 
 def cant_transcribe(page_id):
-    url = f"https://api.notion.com/v1/blocks/{page_id}/children"
+    notion_writer.append_blocks(
+        page_id,
+        paragraph_blocks("Не удалось сделать транскрибацию. Текст отсутствует или слишком короткий.")
+    )
 
-    data = {
-        "children": [
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {
-                                "content": "Не удалось сделать транскрибацию. Текст отсутствует или слишком короткий."
-                            }
-                        }
-                    ]
-                }
-            }
-        ]
-    }
 
-    response = requests.patch(url, headers=notion_headers, json=data)
+def add_duplicate_link(page_id, original_page_id):
+    notion_writer.append_blocks(page_id, [
+        link_paragraph_block("Повтор ролика, сценарий взят отсюда",
+                             f"https://www.notion.so/{original_page_id.replace('-', '')}")
+    ])
 
 
 # Функция ожидания завершения работы ассистента
 def wait_on_run(run, thread):
     while run.status == "queued" or run.status == "in_progress":
-        run = client.beta.threads.runs.retrieve(
+        run = get_openai_client().beta.threads.runs.retrieve(
             thread_id=thread.id,
             run_id=run.id,
         )
@@ -371,10 +270,10 @@ def wait_on_run(run, thread):
 
 
 def submit_message(assistant_id, thread, user_message):
-    client.beta.threads.messages.create(
+    get_openai_client().beta.threads.messages.create(
         thread_id=thread.id, role="user", content=user_message
     )
-    return client.beta.threads.runs.create(
+    return get_openai_client().beta.threads.runs.create(
         thread_id=thread.id,
         assistant_id=assistant_id,
     )
@@ -382,14 +281,14 @@ def submit_message(assistant_id, thread, user_message):
 
 def get_response(thread):
     # Получаем объект SyncCursorPage, содержащий список сообщений
-    response = client.beta.threads.messages.list(thread_id=thread.id, order="asc")
+    response = get_openai_client().beta.threads.messages.list(thread_id=thread.id, order="asc")
 
     # Доступ к данным сообщений через .data
     return response.data
 
 
 def create_thread_and_run(user_input, assistant_id):
-    thread = client.beta.threads.create()
+    thread = get_openai_client().beta.threads.create()
     run = submit_message(assistant_id, thread, user_input)
     return thread, run
 
@@ -402,7 +301,7 @@ def pretty_print(messages):
 
 def get_unique_text_from_assistant(transcription_text):
     # Создаем новый поток общения с ассистентом и отправляем запрос на уникализацию текста
-    thread, run = create_thread_and_run(f"{transcription_text}", os.getenv("TRANSCRIP_ASSISTANT"))
+    thread, run = create_thread_and_run(f"{transcription_text}", TRANSCRIP_ASSISTANT)
     run = wait_on_run(run, thread)
 
     # Получаем ответ
@@ -413,7 +312,7 @@ def get_unique_text_from_assistant(transcription_text):
 
 def get_headers_from_assistant(unique_text):
     # Создаем новый поток общения с ассистентом и отправляем запрос на создание заголовков
-    thread, run = create_thread_and_run(f"{unique_text}", os.getenv("HEADERS_ASSISTANT"))
+    thread, run = create_thread_and_run(f"{unique_text}", HEADERS_ASSISTANT)
     run = wait_on_run(run, thread)
 
     # Получаем ответ
@@ -422,82 +321,191 @@ def get_headers_from_assistant(unique_text):
     return response_message
 
 
+# Подготовка видео: отметка в Notion, скачивание и преобразование в аудио
+def prepare_video(video):
+    global fatal_errors_count
+    approved = video["properties"]["Одобрено"]["checkbox"]
+    status = video["properties"]["Статус"]['status']['name']
+    stage = video["properties"]["Этап"]['select']
+    if not (approved and status == 'N/A' and (stage is None or stage['name'] == 'AI')):
+        return None
+
+    print(video)
+    page_id = video["id"]
+    video_url = video["properties"]["Референс"]["url"]
+
+    # Обновляем статус на AI
+    update_notion_properties(page_id, "AI", None)
+
+    # Скачиваем видео (у каждой страницы свой файл, чтобы в пачке они не перезаписывали друг друга)
+    video_file = os.path.join(os.getcwd(), f"{page_id}.mp4")
+
+    tries = 0
+
+    while True:
+        try:
+            print(1)
+            video_file_url = download_video(video_url, video_file)
+            fatal_errors_count = 0
+            break
+        except Exception as e:
+            print(e)
+            fatal_errors_count += 1
+            tries += 1
+            if tries > 3:
+                break
+    if tries > 3:
+        print(f"Ошибка при скачивании видео: {video_url}")
+        return None
+    if video_file_url is None:
+        # Лимит RapidAPI: видео не скачано, администраторы уже предупреждены
+        return None
+
+    # Преобразуем видео в аудио в фоне, пока скачиваются следующие видео пачки
+    audio_file = video_file.replace(".mp4", ".mp3")
+    return {"page_id": page_id, "video_file": video_file, "audio_file": audio_file,
+            "conversion": media_pool.submit(video_file, audio_file)}
+
+
+# Ожидание конвертации; при ошибке удаляются видео и недописанное аудио
+def wait_conversion(item):
+    try:
+        result = item.pop("conversion").result()
+    except Exception:
+        remove_media(item)
+        raise
+    print(f"ffmpeg: {item['video_file']} за {result['seconds']:.1f} с")
+    return item
+
+
+def remove_media(item):
+    for path in (item["video_file"], item["audio_file"]):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Уникализация транскрибации, генерация заголовков и запись в Notion
+def finish_video(item, transcript_orig):
+    page_id = item["page_id"]
+    if not transcript_orig or len(transcript_orig.split()) < 5:
+        print('Не удалось транскрибировать')
+        cant_transcribe(page_id)
+        update_notion_properties(page_id, "СЦЕНАРИЙ", "ВЗЯТЬ В РАБОТУ")
+        notion_writer.flush_page(page_id)
+        return
+
+    duplicate = dedup_index.find(transcript_orig, exclude=page_id)
+    if duplicate is not None:
+        # Повтор уже обработанного ролика: берем готовый сценарий и заголовки
+        print(f"Повтор страницы {duplicate['page_id']} (сходство {duplicate['similarity']:.2f})")
+        unique_text = duplicate["unique_text"]
+        headers_text = duplicate["headers_text"]
+        add_duplicate_link(page_id, duplicate["page_id"])
+    else:
+        # Определяем язык
+        language = detect_language(transcript_orig)
+
+        if language != "ru":
+            transcript = translate_text_with_openai(transcript_orig)
+        else:
+            transcript = transcript_orig
+        # Уникализируем текст
+        unique_text = get_unique_text_from_assistant(transcript)
+
+        # Генерируем заголовки
+        headers_text = get_headers_from_assistant(unique_text)
+
+        dedup_index.add(page_id, transcript_orig, unique_text, headers_text)
+
+    # Обновляем свойства страницы в Notion
+    update_notion_properties(page_id, "СЦЕНАРИЙ", "ВЗЯТЬ В РАБОТУ")
+
+    # Добавляем блоки с текстом в Notion
+    add_notion_blocks(page_id, unique_text, headers_text, transcript_orig)
+
+    # Готовый сценарий отправляем сразу, чтобы не потерять его при перезапуске
+    notion_writer.flush_page(page_id)
+
+
+# Обработка пачки видео с общей транскрибацией
+def process_batch(batch):
+    prepared = []
+    for video in batch:
+        try:
+            item = prepare_video(video)
+            if item is not None:
+                prepared.append(item)
+        except Exception as e:
+            print(e)
+
+    items = []
+    for item in prepared:
+        try:
+            items.append(wait_conversion(item))
+        except Exception as e:
+            print(e)
+
+    if not items:
+        return
+
+    try:
+        try:
+            transcripts = transcribe_batch([item["audio_file"] for item in items])
+        except Exception as e:
+            # Если пачка не прошла, транскрибируем по одному, чтобы не потерять остальные видео
+            print(e)
+            transcripts = []
+            for item in items:
+                try:
+                    transcripts.append(transcribe_audio(item["audio_file"]))
+                except Exception as e:
+                    print(e)
+                    transcripts.append(False)
+    finally:
+        for item in items:
+            remove_media(item)
+
+    for item, transcript_orig in zip(items, transcripts):
+        # False — ошибка транскрибации, видео остается на этапе AI
+        if transcript_orig is False:
+            continue
+        try:
+            finish_video(item, transcript_orig)
+        except Exception as e:
+            print(e)
+
+
+# Один проход по одобренным видео
+def process_pending_videos():
+    video_scheduler.start_pass()
+    # Сначала дописываем то, что не ушло в Notion в прошлый раз
+    notion_writer.flush()
+    try:
+        video_scheduler.set_donor_averages(get_donor_average_views())
+    except Exception as e:
+        # Без свежих средних считаем KF по прошлым
+        print(e)
+
+    while True:
+        # Очередь перечитывается перед каждой пачкой, чтобы свежие сильные видео обгоняли старый хвост
+        # Страницы с неотправленными записями уже обработаны: Notion просто еще не знает об этом
+        videos = [video for video in get_videos_from_notion() if video["id"] not in notion_writer.pending]
+        video_scheduler.sync(videos)
+        batch = video_scheduler.take(AI_BATCH_SIZE)
+        if not batch:
+            break
+        process_batch(batch)
+
+    notion_writer.flush()
+
+
 # Основной процесс обработки
 def process_videos():
-    global fatal_errors_count
+    # Прогреваем движок транскрибации до первого видео
+    get_transcription_backend()
     while True:
-        videos = get_videos_from_notion()
-        for video in videos:
-            try:
-                approved = video["properties"]["Одобрено"]["checkbox"]
-                status = video["properties"]["Статус"]['status']['name']
-                stage = video["properties"]["Этап"]['select']
-                if approved and status == 'N/A' and (stage is None or stage['name'] == 'AI'):
-                    print(video)
-                    page_id = video["id"]
-                    video_url = video["properties"]["Референс"]["url"]
-
-                    # Обновляем статус на AI
-                    update_notion_properties(page_id, "AI", None)
-
-                    # Скачиваем видео
-
-                    tries = 0
-
-                    while True:
-                        try:
-                            print(1)
-                            video_file_url = download_video(video_url)
-                            fatal_errors_count = 0
-                            break
-                        except Exception as e:
-                            print(e)
-                            fatal_errors_count += 1
-                            tries += 1
-                            if tries > 3:
-                                break
-                    if tries > 3:
-                        print(f"Ошибка при скачивании видео: {video_url}")
-                        continue
-
-                    # Преобразуем видео в аудио
-                    audio_file = convert_video_to_audio(os.getcwd() + "/downloaded_video.mp4")
-
-                    # Транскрибируем аудио
-                    transcript_orig = transcribe_audio(audio_file)
-                    if not transcript_orig or len(transcript_orig.split()) < 5:
-                        os.remove('downloaded_video.mp4')
-                        os.remove('downloaded_video.mp3')
-                        print('Не удалось транскрибировать')
-                        cant_transcribe(page_id)
-                        update_notion_properties(page_id, "СЦЕНАРИЙ", "ВЗЯТЬ В РАБОТУ")
-                        continue
-
-                    os.remove('downloaded_video.mp4')
-                    os.remove('downloaded_video.mp3')
-
-                    # Определяем язык
-                    language = detect_language(transcript_orig)
-
-                    if language != "ru":
-                        transcript = translate_text_with_openai(transcript_orig)
-                    else:
-                        transcript = transcript_orig
-                    # Уникализируем текст
-                    unique_text = get_unique_text_from_assistant(transcript)
-
-                    # Генерируем заголовки
-                    headers_text = get_headers_from_assistant(unique_text)
-
-                    # Обновляем свойства страницы в Notion
-                    update_notion_properties(page_id, "СЦЕНАРИЙ", "ВЗЯТЬ В РАБОТУ")
-
-                    # Добавляем блоки с текстом в Notion
-                    add_notion_blocks(page_id, unique_text, headers_text, transcript_orig)
-            except Exception as e:
-                print(e)
-
-        time.sleep(60)
+        process_pending_videos()
+        time.sleep(AI_POLL_INTERVAL)
 
 if __name__ == "__main__":
     process_videos()
@@ -1,36 +1,19 @@
-import asyncio
-import os
 import traceback
 from datetime import datetime, timedelta
 
-import dotenv
 import pytz
 import requests
-from aiogram import Bot
 
-dotenv.load_dotenv()
+from config import (NOTION_API_URL, NOTION_DONORS_DB_ID, NOTION_REELS_DB_ID, RAPIDAPI_KEY,
+                    notify_admins, notion_headers)
 
-bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"))
-
-# Конфигурационные параметры
-NOTION_TOKEN = os.getenv("NOTION_TOKEN")
-NOTION_DONORS_DB_ID = os.getenv("NOTION_DONORS_DB_ID")
-NOTION_REELS_DB_ID = os.getenv("NOTION_REELS_DB_ID")
-RAPIDAPI_KEY = os.getenv("RAPID_API_KEY")
 DAYS_TO_FETCH = 30  # Количество дней для сбора Reels
 MIN_DAYS_OLD = 3  # Минимальный возраст Reels для расчета среднего числа просмотров
 
-# Заголовки для запросов к Notion API
-notion_headers = {
-    "Authorization": f"Bearer {NOTION_TOKEN}",
-    "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json"
-}
-
 
 # Функция для получения списка доноров из Notion
 def get_donors_from_notion():
-    url = f"https://api.notion.com/v1/databases/{NOTION_DONORS_DB_ID}/query"
+    url = f"{NOTION_API_URL}/databases/{NOTION_DONORS_DB_ID}/query"
     payload = {}
     donors = []
 
@@ -59,6 +42,33 @@ def get_donors_from_notion():
     return donors
 
 
+class Reel:
+    """Компактная запись о Reel: только поля, которые пишутся в Notion."""
+
+    __slots__ = ("id", "code", "username", "title", "created_at",
+                 "play_count", "like_count", "comment_count", "reshare_count")
+
+    def __init__(self, item):
+        caption = item.get('caption') or {}
+        self.id = item['id']
+        self.created_at = datetime.fromtimestamp(caption.get('created_at'))
+        self.code = item.get('code', '')
+        self.username = item.get('user', {}).get('username', '')
+        caption_text = caption.get('text', '')
+        if caption_text:
+            caption_words = caption_text.split()
+            if len(caption_words) > 7:
+                self.title = ' '.join(caption_words[:7])
+            else:
+                self.title = caption_text
+        else:
+            self.title = self.id
+        self.play_count = item.get('play_count', 0) or 0
+        self.like_count = item.get('like_count', 0) or 0
+        self.comment_count = item.get('comment_count', 0) or 0
+        self.reshare_count = item.get('reshare_count', 0) or 0
+
+
 # Функция для получения Reels от доноров
 def get_reels_from_donor(username):
     url = "https://instagram-social-api.p.rapidapi.com/v1/reels"
@@ -81,15 +91,15 @@ def get_reels_from_donor(username):
             items = data.get("data", {}).get("items", [])
             for item in items:
                 try:
-                    created_at = datetime.fromtimestamp(item.get('caption', {}).get('created_at'))
+                    reel = Reel(item)
 
-                    if created_at < threshold_date:
+                    if reel.created_at < threshold_date:
                         check_pin = True
                         continue
                     else:
                         check_pin = False
 
-                    reels.append(item)
+                    reels.append(reel)
                 except Exception as e:
                     pass
 
@@ -108,8 +118,8 @@ def get_reels_from_donor(username):
 # Функция для добавления или обновления Reels в Notion
 def upsert_reel_in_notion(reel_data, average_views):
     # Проверяем, существует ли Reel в базе Notion
-    reel_id = reel_data['id']
-    search_url = f"https://api.notion.com/v1/databases/{NOTION_REELS_DB_ID}/query"
+    reel_id = reel_data.id
+    search_url = f"{NOTION_API_URL}/databases/{NOTION_REELS_DB_ID}/query"
     filter_data = {
         "filter": {
             "property": "ID",
@@ -125,14 +135,14 @@ def upsert_reel_in_notion(reel_data, average_views):
         print(0)
         # Обновляем существующий Reel
         page_id = results[0]['id']
-        update_url = f"https://api.notion.com/v1/pages/{page_id}"
+        update_url = f"{NOTION_API_URL}/pages/{page_id}"
         properties = construct_reel_properties(reel_data, average_views)
         data = {"properties": properties}
         response = requests.patch(update_url, headers=notion_headers, json=data)
     else:
         print(1)
         # Добавляем новый Reel
-        create_url = "https://api.notion.com/v1/pages"
+        create_url = f"{NOTION_API_URL}/pages"
         properties = construct_reel_properties(reel_data, average_views)
         data = {
             "parent": {"database_id": NOTION_REELS_DB_ID},
@@ -147,37 +157,21 @@ def upsert_reel_in_notion(reel_data, average_views):
 
 # Функция для построения свойств Reel для Notion
 def construct_reel_properties(reel_data, average_views):
-    reel_id = reel_data['id']
-    created_at = datetime.fromtimestamp(reel_data.get('caption', {}).get('created_at'))
-    code = reel_data.get('code', '')
-    link = f"https://www.instagram.com/reel/{code}"
-    username = reel_data.get('user', {}).get('username', '')
-    caption_text = reel_data.get('caption', {}).get('text', '')
-    if caption_text:
-        caption_words = caption_text.split()
-        if len(caption_words) > 7:
-            title = ' '.join(caption_words[:7])
-        else:
-            title = caption_text
-    else:
-        title = reel_id
-    play_count = reel_data.get('play_count', 0) or 0
-    like_count = reel_data.get('like_count', 0) or 0
-    comment_count = reel_data.get('comment_count', 0) or 0
-    reshare_count = reel_data.get('reshare_count', 0) or 0
+    play_count = reel_data.play_count
+    reshare_count = reel_data.reshare_count
     ER = round((reshare_count / play_count) * 100, 2) if play_count > 0 else 0
     KF = round(play_count / average_views, 2) if average_views > 0 else 0
     properties = {
-        "Дата референса": {"date": {"start": created_at.isoformat()}},
-        "Референс": {"url": link},
-        "Автор": {"rich_text": [{"text": {"content": username}}]},
-        "Название": {"title": [{"text": {"content": title}}]},
+        "Дата референса": {"date": {"start": reel_data.created_at.isoformat()}},
+        "Референс": {"url": f"https://www.instagram.com/reel/{reel_data.code}"},
+        "Автор": {"rich_text": [{"text": {"content": reel_data.username}}]},
+        "Название": {"title": [{"text": {"content": reel_data.title}}]},
         "Просмотры": {"number": play_count},
-        "Лайки": {"number": like_count},
-        "Комменты": {"number": comment_count},
+        "Лайки": {"number": reel_data.like_count},
+        "Комменты": {"number": reel_data.comment_count},
         "Репосты": {"number": reshare_count},
         "ER": {"number": ER},
-        "ID": {"number": int(reel_id)},
+        "ID": {"number": int(reel_data.id)},
     }
     return properties
 
@@ -205,7 +199,7 @@ def update_donor_info(donor, average_views):
         growth = follower_count - previous_followers if previous_followers else 0
 
         # Обновление информации о доноре в Notion
-        update_url = f"https://api.notion.com/v1/pages/{donor_id}"
+        update_url = f"{NOTION_API_URL}/pages/{donor_id}"
         properties = {
             "Ссылка": {"url": "https://www.instagram.com/" + username},
             "Подписчики": {"number": follower_count},
@@ -223,7 +217,7 @@ def update_donor_info(donor, average_views):
 
 
 def get_videos_from_notion():
-    url = f"https://api.notion.com/v1/databases/{NOTION_REELS_DB_ID}/query"
+    url = f"{NOTION_API_URL}/databases/{NOTION_REELS_DB_ID}/query"
     all_videos = []
     has_more = True
     next_cursor = None
@@ -271,7 +265,7 @@ def clean_old_reels():
                         # Удаляем Reel
                         page_id = reel['id']
                         print('Удаление')
-                        delete_url = f"https://api.notion.com/v1/pages/{page_id}"
+                        delete_url = f"{NOTION_API_URL}/pages/{page_id}"
                         data = {"archived": True}
                         response = requests.patch(delete_url, headers=notion_headers, json=data)
                         if response.status_code == 200:
@@ -295,10 +289,9 @@ def main():
             reels = get_reels_from_donor(username)
 
             current_date = datetime.now()
-            reels_for_average = [reel for reel in reels if (current_date - datetime.fromtimestamp(
-                reel.get('caption', {}).get('created_at'))).days >= MIN_DAYS_OLD]
+            reels_for_average = [reel for reel in reels if (current_date - reel.created_at).days >= MIN_DAYS_OLD]
             if reels_for_average:
-                total_views = sum(reel.get('play_count', 0) or 0 for reel in reels_for_average)
+                total_views = sum(reel.play_count for reel in reels_for_average)
                 average_views = total_views / len(reels_for_average)
             else:
                 average_views = 0
@@ -308,20 +301,17 @@ def main():
                 try:
                     upsert_reel_in_notion(reel, average_views)
                 except Exception:
-                    asyncio.run(bot.send_message(414054050, 'Ошибка обновления инфо о рилсах!'))
-                    asyncio.run(bot.send_message(663679771, 'Ошибка обновления инфо о рилсах!'))
+                    notify_admins('Ошибка обновления инфо о рилсах!')
                     print(traceback.format_exc())
 
             try:
                 update_donor_info(donor, round(average_views))
             except Exception:
-                asyncio.run(bot.send_message(414054050, 'Ошибка обновления инфо о донарах!'))
-                asyncio.run(bot.send_message(663679771, 'Ошибка обновления инфо о донарах!'))
+                notify_admins('Ошибка обновления инфо о донарах!')
                 print(traceback.format_exc())
 
         except Exception:
-            asyncio.run(bot.send_message(414054050, 'Клиент что-то поменял. Ошибка!'))
-            asyncio.run(bot.send_message(663679771, 'Клиент что-то поменял. Ошибка!'))
+            notify_admins('Клиент что-то поменял. Ошибка!')
             print(traceback.format_exc())
 
     clean_old_reels()
@@ -0,0 +1,149 @@
+import heapq
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+
+def _number(properties, name):
+    value = properties.get(name, {}) or {}
+    return value.get("number") or 0
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _author(properties):
+    rich_text = (properties.get("Автор", {}) or {}).get("rich_text") or []
+    return "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in rich_text)
+
+
+class VideoScheduler:
+    """Очередь одобренных видео для AI по приоритету.
+
+    Приоритет = w_views * lg(просмотры) + w_er * ER + w_kf * KF
+    + w_age * (часы с момента одобрения). KF — отношение просмотров ролика
+    к среднему числу просмотров донора (из базы доноров, по полю «Автор»).
+    Старение одинаково для всех видео, поэтому порядок можно хранить в куче
+    с постоянным ключом: старые видео постепенно обгоняют свежие и не
+    голодают. Видео с дедлайном, до которого осталось меньше
+    deadline_window секунд, идут вне очереди.
+
+    Notion не хранит момент установки галочки «Одобрено», а last_edited_time
+    перезаписывает ежедневный обход парсера. Поэтому временем одобрения
+    считается момент, когда видео впервые попало в выборку; эти отметки
+    сохраняются в state_path и переживают перезапуск.
+    """
+
+    def __init__(self, state_path=None, w_views=1.0, w_er=0.5, w_kf=2.0, w_age=0.1, deadline_window=30 * 60):
+        self.state_path = state_path
+        self.w_views = w_views
+        self.w_er = w_er
+        self.w_kf = w_kf
+        self.w_age = w_age
+        self.deadline_window = deadline_window
+        self.approved_at = {}  # page_id -> время одобрения (unix)
+        self.deadlines = {}  # page_id -> дедлайн (unix)
+        self.donor_averages = {}  # username -> среднее число просмотров
+        self.taken = set()  # видео, выданные в текущем проходе
+        self.videos = {}
+        self.heap = []
+        self.deadline_heap = []
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.approved_at = json.load(f)
+
+    def _save(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.approved_at, f)
+        os.replace(tmp_path, self.state_path)
+
+    def set_donor_averages(self, donor_averages):
+        self.donor_averages = donor_averages
+
+    def base_score(self, video):
+        properties = video.get("properties", {})
+        views = _number(properties, "Просмотры")
+        average_views = self.donor_averages.get(_author(properties)) or 0
+        kf = views / average_views if average_views > 0 else 0
+        return (self.w_views * math.log10(1 + views)
+                + self.w_er * _number(properties, "ER")
+                + self.w_kf * kf)
+
+    # Начало прохода: выданные ранее видео снова можно брать в работу
+    def start_pass(self):
+        self.taken.clear()
+
+    # Синхронизация с очередной выборкой из Notion
+    def sync(self, videos):
+        now = time.time()
+        fetched = {video["id"]: video for video in videos}
+        changed = False
+        for page_id in list(self.approved_at):
+            if page_id not in fetched:
+                del self.approved_at[page_id]
+                changed = True
+
+        self.videos = {}
+        self.deadlines = {}
+        self.heap = []
+        self.deadline_heap = []
+        for page_id, video in fetched.items():
+            if page_id not in self.approved_at:
+                self.approved_at[page_id] = now
+                changed = True
+            if page_id in self.taken:
+                continue
+            self.videos[page_id] = video
+
+            # Дедлайн перечитывается при каждой синхронизации: правка или очистка даты в Notion сразу учитывается
+            deadline = (video.get("properties", {}).get("Дедлайн", {}) or {}).get("date")
+            if deadline and deadline.get("start"):
+                self.deadlines[page_id] = _timestamp(deadline["start"])
+
+            key = self.base_score(video) - self.w_age * self.approved_at[page_id] / 3600
+            self.heap.append((-key, page_id))
+            if page_id in self.deadlines:
+                self.deadline_heap.append((self.deadlines[page_id], page_id))
+
+        heapq.heapify(self.heap)
+        heapq.heapify(self.deadline_heap)
+        if changed:
+            self._save()
+
+    def pop(self):
+        now = time.time()
+        while self.deadline_heap and self.deadline_heap[0][1] not in self.videos:
+            heapq.heappop(self.deadline_heap)
+        if self.deadline_heap and self.deadline_heap[0][0] - now <= self.deadline_window:
+            page_id = heapq.heappop(self.deadline_heap)[1]
+        else:
+            page_id = None
+            while self.heap:
+                candidate = heapq.heappop(self.heap)[1]
+                if candidate in self.videos:
+                    page_id = candidate
+                    break
+            if page_id is None:
+                return None
+
+        # Время одобрения сохраняется до следующей синхронизации:
+        # если обработка упадет, видео не потеряет накопленный возраст
+        self.taken.add(page_id)
+        return self.videos.pop(page_id)
+
+    def take(self, count):
+        batch = []
+        while len(batch) < count:
+            video = self.pop()
+            if video is None:
+                break
+            batch.append(video)
+        return batch
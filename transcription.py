@@ -0,0 +1,115 @@
+import bisect
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30  # Whisper обрабатывает аудио окнами по 30 секунд
+
+
+class TranscriptionBackend:
+    """Интерфейс движка транскрибации."""
+
+    def transcribe(self, audio_file):
+        raise NotImplementedError
+
+    # По умолчанию файлы обрабатываются по одному
+    def transcribe_batch(self, audio_files):
+        return [self.transcribe(audio_file) for audio_file in audio_files]
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """Транскрибация через OpenAI whisper-1."""
+
+    def __init__(self, client, model="whisper-1"):
+        self.client = client
+        self.model = model
+
+    def transcribe(self, audio_file):
+        with open(audio_file, "rb") as f:
+            return self.client.audio.transcriptions.create(
+                model=self.model,
+                file=f,
+                response_format="text"
+            )
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Локальная транскрибация на CPU через faster-whisper (int8).
+
+    Модель загружается один раз при создании движка и остается в памяти.
+    Для пачки файлов язык определяется по каждому файлу отдельно, файлы
+    группируются по языку, а речевые фрагменты (VAD, не длиннее 30 секунд)
+    всех файлов группы декодируются общими батчами.
+    """
+
+    def __init__(self, model_name="small", cpu_threads=0, batch_size=8):
+        try:
+            from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+            from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+        except ImportError:
+            raise Exception("Для TRANSCRIBE_BACKEND=local нужен пакет faster-whisper "
+                            "(образ собирается с --build-arg LOCAL_TRANSCRIBE=1)")
+
+        self.decode_audio = decode_audio
+        self.get_speech_timestamps = get_speech_timestamps
+        self.merge_segments = merge_segments
+        self.vad_options = VadOptions(max_speech_duration_s=WINDOW_SECONDS, min_silence_duration_ms=160)
+        self.batch_size = batch_size
+        self.model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+        self.pipeline = BatchedInferencePipeline(model=self.model)
+
+    def transcribe(self, audio_file):
+        segments, _ = self.model.transcribe(audio_file, beam_size=1, vad_filter=True)
+        return " ".join(segment.text.strip() for segment in segments)
+
+    def transcribe_batch(self, audio_files):
+        if len(audio_files) < 2:
+            return super().transcribe_batch(audio_files)
+
+        clips = [self.decode_audio(audio_file, sampling_rate=SAMPLE_RATE) for audio_file in audio_files]
+        groups = {}
+        for index, clip in enumerate(clips):
+            language, _, _ = self.model.detect_language(clip, vad_filter=True)
+            groups.setdefault(language, []).append(index)
+
+        texts = [""] * len(clips)
+        for language, indexes in groups.items():
+            for index, text in zip(indexes, self._transcribe_group([clips[i] for i in indexes], language)):
+                texts[index] = text
+        return texts
+
+    # Файлы одного языка склеиваются в одну дорожку, границы фрагментов не выходят за файл
+    def _transcribe_group(self, clips, language):
+        import numpy as np
+
+        clip_starts = []
+        clip_timestamps = []
+        offset = 0
+        for clip in clips:
+            clip_starts.append(offset / SAMPLE_RATE)
+            speech = self.get_speech_timestamps(clip, self.vad_options)
+            for chunk in self.merge_segments(speech, self.vad_options):
+                clip_timestamps.append({"start": offset + chunk["start"], "end": offset + chunk["end"]})
+            offset += len(clip)
+
+        texts = [[] for _ in clips]
+        if clip_timestamps:
+            segments, _ = self.pipeline.transcribe(
+                np.concatenate(clips),
+                language=language,
+                batch_size=self.batch_size,
+                clip_timestamps=clip_timestamps,
+                without_timestamps=True,
+            )
+            # Сегмент относится к тому файлу, в чьи границы попадает его начало
+            for segment in segments:
+                index = bisect.bisect_right(clip_starts, segment.start + 0.01) - 1
+                texts[max(index, 0)].append(segment.text.strip())
+        return [" ".join(text) for text in texts]
+
+
+# Выбор движка для конкретного развертывания
+def create_backend(name, client=None, model_name="small", cpu_threads=0, batch_size=8):
+    if name == "openai":
+        return OpenAIBackend(client)
+    if name == "local":
+        return LocalWhisperBackend(model_name=model_name, cpu_threads=cpu_threads, batch_size=batch_size)
+    raise Exception(f"Неизвестный движок транскрибации: {name}")